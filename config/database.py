@@ -16,8 +16,22 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "cs_project_db")
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# Connection pool sizing
+# FastAPI runs sync endpoints in a threadpool, so the default pool (5 + 10 overflow)
+# throttles concurrency. Pre-ping drops connections the server closed while idle.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 40))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds
+
 # Create SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_use_lifo=True
+)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -32,3 +46,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def commit_without_expire(db):
+    """
+    Commit, keeping this session's objects loaded instead of expiring them.
+    For write paths that return what they just flushed: all column defaults are
+    set Python-side, so the post-commit reload would only re-read values already
+    held. Other commits in the session still expire as usual.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
@@ -1,13 +1,39 @@
 import redis.asyncio as redis
+import redis as sync_redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Per-operation bound for the sync cache client; a miss costs at most this long
+CACHE_REDIS_TIMEOUT_SECONDS = float(os.getenv("CACHE_REDIS_TIMEOUT_SECONDS", "0.05"))
+
 def get_redis_client():
     redis_host = os.getenv("REDIS_HOST", "localhost")
     redis_port = int(os.getenv("REDIS_PORT", 6379))
     return redis.Redis(host=redis_host, port=redis_port, db=0, decode_responses=True)
 
+def get_sync_redis_client():
+    """
+    Blocking client for synchronous service code running in the threadpool.
+    It only fronts caches that fall back to the database, so it fails fast:
+    short timeouts and no retries, rather than redis-py's 5s timeouts with backoff.
+    """
+    redis_host = os.getenv("REDIS_HOST", "localhost")
+    redis_port = int(os.getenv("REDIS_PORT", 6379))
+    return sync_redis.Redis(
+        host=redis_host,
+        port=redis_port,
+        db=0,
+        decode_responses=True,
+        socket_connect_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+        socket_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+        retry=Retry(NoBackoff(), 0),
+        retry_on_timeout=False
+    )
+
 # Create a single instance to be imported
 redis_client = get_redis_client()
+sync_redis_client = get_sync_redis_client()
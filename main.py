@@ -17,6 +17,8 @@ sys.path.remove("middleware")
 from fastapi_limiter import FastAPILimiter
 from config.redis_db import redis_client
 from config.database import engine, Base
+from utils.security import check_sha_acceleration, handle_deleted_current_user
+from sqlalchemy.orm.exc import ObjectDeletedError
 
 
 # Create tables (for development purposes)
@@ -25,6 +27,7 @@ Base.metadata.create_all(bind=engine)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await FastAPILimiter.init(redis_client)
+    check_sha_acceleration()
     yield
 
 app = FastAPI(
@@ -41,6 +44,9 @@ app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RequestSizeLimitMiddleware, max_request_size=10 * 1024 * 1024)  # 10 MB
 app.add_middleware(AuditLoggingMiddleware)
 
+# A user deleted after get_current_user served it from cache surfaces as a 401
+app.add_exception_handler(ObjectDeletedError, handle_deleted_current_user)
+
 # ============ NEW API ROUTES (/api/*) ============
 # These match the frontend expectations
 
@@ -0,0 +1,41 @@
+"""Add patient list indexes for invoices and prescriptions
+
+Revision ID: f3b7c1d9a2e6
+Revises: c0e8a6888bf5
+Create Date: 2026-10-15 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7c1d9a2e6'
+down_revision: Union[str, Sequence[str], None] = 'c0e8a6888bf5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_invoices_patient_issue_date', 'invoices',
+            ['patient_id', sa.text('issue_date DESC')],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_prescriptions_patient_issued_date', 'prescriptions',
+            ['patient_id', sa.text('issued_date DESC')],
+            unique=False, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_prescriptions_patient_issued_date', table_name='prescriptions', postgresql_concurrently=True)
+        op.drop_index('ix_invoices_patient_issue_date', table_name='invoices', postgresql_concurrently=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -50,6 +50,10 @@ class Invoice(Base):
     payments = relationship("Payment", back_populates="invoice", cascade="all, delete-orphan")
 
 
+# Matches the patient invoice list query (filter by patient, newest first)
+Index("ix_invoices_patient_issue_date", Invoice.patient_id, Invoice.issue_date.desc())
+
+
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -35,6 +35,10 @@ class Prescription(Base):
     medications = relationship("PrescriptionMedication", back_populates="prescription", cascade="all, delete-orphan")
 
 
+# Matches the patient prescription list query (filter by patient, newest first)
+Index("ix_prescriptions_patient_issued_date", Prescription.patient_id, Prescription.issued_date.desc())
+
+
 class PrescriptionMedication(Base):
     __tablename__ = "prescription_medications"
 
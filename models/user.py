@@ -18,7 +18,7 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=True)  # User's display name
     hashed_password = Column(String, nullable=False)
-    salt = Column(String, nullable=False)  # Unique random salt per user
+    salt = Column(String, nullable=False)  # Legacy per-user salt; empty for hashes relying on Argon2's own salt
     role = Column(Enum(UserRole), default=UserRole.PATIENT, nullable=False)
     is_verified = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)  # For soft delete / account disable
@@ -10,7 +10,7 @@ from models.audit import AuditLog
 from models.blocked_ip import BlockedIP
 from models.security_threat import SecurityThreat, AdminNotification, ThreatLevel, ThreatType
 from schemas.user import UserResponse
-from utils.security import get_current_user
+from utils.security import get_current_user, invalidate_cached_user
 import json
 
 router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
@@ -112,6 +112,9 @@ async def update_user_role(
     user.role = new_role
     db.commit()
     
+    # Drop the cached user so auth and prescription checks see the change
+    invalidate_cached_user(user_id)
+    
     return {"message": f"User role updated to {new_role.value}"}
 
 
@@ -145,6 +148,8 @@ async def delete_user(
     db.delete(user)
     db.commit()
     
+    invalidate_cached_user(user_id)
+    
     return {"message": "User deleted successfully"}
 
 
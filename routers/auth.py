@@ -10,12 +10,12 @@ from utils import (
     get_password_hash,
     verify_password,
     create_access_token,
-    generate_salt,
     generate_verification_code,
+    verify_verification_code,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     generate_device_fingerprint
 )
-from utils.security import get_current_user
+from utils.security import get_current_user, invalidate_cached_token, rehash_password_if_needed
 from services.security_service import ThreatDetectionService
 from datetime import datetime, timedelta
 import logging
@@ -160,9 +160,8 @@ async def signup(user: UserCreate, background_tasks: BackgroundTasks, db: Sessio
     if existing_registration:
         raise HTTPException(status_code=400, detail="Verification code already sent. Please check your email.")
 
-    # 3. Generate Salt and Hash Password
-    salt = generate_salt()
-    hashed_password = get_password_hash(user.password, salt)
+    # 3. Hash Password
+    hashed_password = get_password_hash(user.password)
     
     # 4. Generate Verification Code
     code = generate_verification_code()
@@ -171,7 +170,7 @@ async def signup(user: UserCreate, background_tasks: BackgroundTasks, db: Sessio
     user_data = {
         "email": user.email,
         "hashed_password": hashed_password,
-        "salt": salt,
+        "salt": "",
         "role": "patient",  # Hardcoded to patient
         "code": code
     }
@@ -198,7 +197,7 @@ async def verify_email(verification: UserVerify, db: Session = Depends(get_db)):
     
     # 2. Verify Code (support both 'code' and 'verification_code' from frontend)
     submitted_code = verification.get_code
-    if not submitted_code or stored_data["code"] != submitted_code:
+    if not verify_verification_code(stored_data["code"], submitted_code):
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
     # 3. Create User in DB
@@ -288,6 +287,9 @@ async def login(user_credentials: UserLogin, request: Request, response: Respons
         
         raise HTTPException(status_code=403, detail="Invalid credentials")
     
+    if rehash_password_if_needed(user, user_credentials.password):
+        db.commit()
+    
     # Login Successful - Clear Counter and Failed Login Tracking
     await redis_client.delete(f"failed_login:{user.email}")
     await ThreatDetectionService.clear_failed_attempts(client_ip)
@@ -336,7 +338,7 @@ async def login(user_credentials: UserLogin, request: Request, response: Respons
     # 5. Generate JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+        sub=str(user.id), role=user.role.value, email=user.email,
         expires_delta=access_token_expires
     )
 
@@ -435,7 +437,7 @@ async def refresh_token(request: Request, response: Response, db: Session = Depe
         # Generate new access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         new_access_token = create_access_token(
-            data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+            sub=str(user.id), role=user.role.value, email=user.email,
             expires_delta=access_token_expires
         )
         
@@ -483,6 +485,8 @@ async def logout(request: Request, response: Response):
         except:
             pass
     
+    invalidate_cached_token(request.cookies.get("access_token"))
+    
     # Clear cookies
     response.delete_cookie(key="access_token", path="/")
     response.delete_cookie(key="refresh_token", path="/")
@@ -521,7 +525,7 @@ async def verify_device(verification: UserDeviceVerify, request: Request, db: Se
     stored_data = json.loads(stored_data_json)
     
     # 2. Verify Code
-    if stored_data["code"] != verification.code:
+    if not verify_verification_code(stored_data["code"], verification.code):
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
     # 3. Verify Fingerprint matches (security check)
@@ -545,7 +549,7 @@ async def verify_device(verification: UserDeviceVerify, request: Request, db: Se
     # 7. Generate JWT (Login successful)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value},
+        sub=str(user.id), role=user.role.value,
         expires_delta=access_token_expires
     )
 
@@ -577,7 +581,7 @@ async def reset_password(request: UserResetPassword, db: Session = Depends(get_d
     redis_key = f"reset:{request.email}"
     stored_code = await redis_client.get(redis_key)
 
-    if not stored_code or stored_code != request.code:
+    if not verify_verification_code(stored_code, request.code):
         raise HTTPException(status_code=400, detail="Invalid or expired reset code")
 
     # 2. Get User
@@ -586,12 +590,11 @@ async def reset_password(request: UserResetPassword, db: Session = Depends(get_d
         raise HTTPException(status_code=404, detail="User not found")
 
     # 3. Hash New Password
-    new_salt = generate_salt()
-    new_hashed_password = get_password_hash(request.new_password, new_salt)
+    new_hashed_password = get_password_hash(request.new_password)
 
     # 4. Update User
     user.hashed_password = new_hashed_password
-    user.salt = new_salt
+    user.salt = ""
     db.commit()
 
     # 5. Delete Code from Redis
@@ -637,7 +640,7 @@ async def refresh_token(request: Request, response: Response, db: Session = Depe
     # Generate new access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     new_access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+        sub=str(user.id), role=user.role.value, email=user.email,
         expires_delta=access_token_expires
     )
     
@@ -667,6 +670,8 @@ async def logout(request: Request, response: Response):
         async for key in redis_client.scan_iter(match=pattern):
             await redis_client.delete(key)
     
+    invalidate_cached_token(request.cookies.get("access_token"))
+    
     # Clear cookies
     response.delete_cookie(key="access_token", path="/")
     response.delete_cookie(key="refresh_token", path="/")
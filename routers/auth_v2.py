@@ -20,12 +20,12 @@ from utils import (
     get_password_hash,
     verify_password,
     create_access_token,
-    generate_salt,
     generate_verification_code,
+    verify_verification_code,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     generate_device_fingerprint
 )
-from utils.security import get_current_user
+from utils.security import get_current_user, invalidate_cached_token, rehash_password_if_needed
 from datetime import datetime, timedelta
 import logging
 import json
@@ -216,9 +216,8 @@ async def register(user: UserCreate, background_tasks: BackgroundTasks, db: Sess
     if existing_registration:
         raise HTTPException(status_code=400, detail="Verification code already sent. Please check your email.")
 
-    # 3. Generate Salt and Hash Password
-    salt = generate_salt()
-    hashed_password = get_password_hash(user.password, salt)
+    # 3. Hash Password
+    hashed_password = get_password_hash(user.password)
     
     # 4. Generate Verification Code
     code = generate_verification_code()
@@ -228,7 +227,7 @@ async def register(user: UserCreate, background_tasks: BackgroundTasks, db: Sess
         "email": user.email,
         "name": user.name,
         "hashed_password": hashed_password,
-        "salt": salt,
+        "salt": "",
         "role": user.role.value if user.role else "patient",
         "code": code
     }
@@ -263,7 +262,7 @@ async def verify_email(verification: UserVerify, db: Session = Depends(get_db)):
     
     # 2. Verify Code (handle both field names)
     code = verification.get_code
-    if stored_data["code"] != code:
+    if not verify_verification_code(stored_data["code"], code):
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
     # 3. Create User in DB
@@ -338,6 +337,9 @@ async def login(
         
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    if rehash_password_if_needed(user, user_credentials.password):
+        db.commit()
+    
     # Login Successful - Clear Counter
     await redis_client.delete(f"failed_login:{user.email}")
 
@@ -390,7 +392,7 @@ async def login(
     # 6. Generate Tokens
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+        sub=str(user.id), role=user.role.value, email=user.email,
         expires_delta=access_token_expires
     )
     
@@ -434,7 +436,7 @@ async def verify_device(
     stored_data = json.loads(stored_data_json)
     
     # 2. Verify Code
-    if stored_data["code"] != verification.verification_code:
+    if not verify_verification_code(stored_data["code"], verification.verification_code):
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
     # 3. Get fingerprint
@@ -456,7 +458,7 @@ async def verify_device(
     # 7. Generate Tokens
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+        sub=str(user.id), role=user.role.value, email=user.email,
         expires_delta=access_token_expires
     )
     
@@ -527,7 +529,7 @@ async def refresh_token(request: Request, response: Response, db: Session = Depe
     # Generate new access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     new_access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value, "email": user.email},
+        sub=str(user.id), role=user.role.value, email=user.email,
         expires_delta=access_token_expires
     )
     
@@ -559,6 +561,8 @@ async def logout(request: Request, response: Response):
         async for key in redis_client.scan_iter(match=pattern):
             await redis_client.delete(key)
     
+    invalidate_cached_token(request.cookies.get("access_token"))
+    
     # Clear cookies
     clear_auth_cookies(response)
     
@@ -607,7 +611,7 @@ async def reset_password(request_data: UserResetPassword, db: Session = Depends(
     
     code = request_data.get_code
 
-    if not stored_code or stored_code != code:
+    if not verify_verification_code(stored_code, code):
         raise HTTPException(status_code=400, detail="Invalid or expired reset code")
 
     # 2. Get User
@@ -616,12 +620,11 @@ async def reset_password(request_data: UserResetPassword, db: Session = Depends(
         raise HTTPException(status_code=404, detail="User not found")
 
     # 3. Hash New Password
-    new_salt = generate_salt()
-    new_hashed_password = get_password_hash(request_data.new_password, new_salt)
+    new_hashed_password = get_password_hash(request_data.new_password)
 
     # 4. Update User
     user.hashed_password = new_hashed_password
-    user.salt = new_salt
+    user.salt = ""
     user.updated_at = datetime.utcnow()
     db.commit()
 
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import ObjectDeletedError
 from typing import List, Optional
 from datetime import datetime
 from config.database import get_db
@@ -7,7 +8,7 @@ from models.user import User, UserDevice
 from models.audit import AuditLog, PasswordHistory
 from models.profile import UserProfile
 from schemas.user import UserResponse, UserUpdate, ChangePasswordRequest
-from utils.security import get_current_user, verify_password, get_password_hash, generate_salt
+from utils.security import get_current_user, verify_password, get_password_hash
 from utils.sanitization import InputSanitizer, sanitize_user_input
 from utils.encryption import encrypt_sensitive_data, decrypt_sensitive_data
 import sys
@@ -91,6 +92,10 @@ async def update_current_user_profile(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ObjectDeletedError:
+        # Account deleted since authentication; the app handler answers 401
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -131,6 +136,10 @@ async def delete_current_user_account(
         
         return {"message": "Account deletion requested. Contact support to complete the process."}
     
+    except ObjectDeletedError:
+        # Account deleted since authentication; the app handler answers 401
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -268,13 +277,12 @@ async def change_password(
     )
     db.add(old_password_entry)
     
-    # Generate new salt and hash
-    new_salt = generate_salt()
-    new_hashed_password = get_password_hash(password_change.new_password, new_salt)
+    # Hash new password
+    new_hashed_password = get_password_hash(password_change.new_password)
     
     # Update password
     current_user.hashed_password = new_hashed_password
-    current_user.salt = new_salt
+    current_user.salt = ""
     
     db.commit()
     
@@ -333,7 +341,7 @@ async def get_user_profile(
     }
     
     # Decrypt sensitive data
-    decrypted_data = decrypt_sensitive_data(profile_data, sensitive_fields)
+    decrypted_data = decrypt_sensitive_data(profile_data, sensitive_fields, inplace=True)
     
     return decrypted_data
 
@@ -360,7 +368,7 @@ async def create_or_update_profile(
     ]
     
     # Encrypt sensitive data
-    encrypted_data = encrypt_sensitive_data(profile_data, sensitive_fields)
+    encrypted_data = encrypt_sensitive_data(profile_data, sensitive_fields, inplace=True)
     
     # Check if profile exists
     profile = db.query(UserProfile).filter(
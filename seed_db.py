@@ -10,7 +10,7 @@ from sqlalchemy.orm import Session
 from config.database import engine, SessionLocal
 from models import User, UserRole, Doctor, Patient
 from models.profile import UserProfile
-from utils.security import get_password_hash, generate_salt
+from utils.security import get_password_hash
 from datetime import datetime, date
 import random
 
@@ -48,14 +48,13 @@ def seed_doctors(db: Session):
             continue
         
         # Create user account for doctor
-        salt = generate_salt()
-        hashed_password = get_password_hash("Doctor@123", salt)  # Default password
+        hashed_password = get_password_hash("Doctor@123")  # Default password
         
         user = User(
             email=doc["email"],
             name=doc["name"],
             hashed_password=hashed_password,
-            salt=salt,
+            salt="",
             role=UserRole.DOCTOR,
             is_verified=True,
             is_active=True,
@@ -140,14 +139,13 @@ def seed_admin(db: Session):
         print(f"  ⏭️  Admin already exists")
         return
     
-    salt = generate_salt()
-    hashed_password = get_password_hash("Admin@123", salt)
+    hashed_password = get_password_hash("Admin@123")
     
     admin = User(
         email=admin_email,
         name="System Administrator",
         hashed_password=hashed_password,
-        salt=salt,
+        salt="",
         role=UserRole.ADMIN,
         is_verified=True,
         is_active=True,
@@ -1,4 +1,7 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, case, cast, literal, text, bindparam
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, selectinload, raiseload
+from config.database import commit_without_expire
 from datetime import datetime
 from typing import List, Optional
 from fastapi import HTTPException, status
@@ -6,6 +9,25 @@ from models.billing import Invoice, InvoiceItem, Payment, InvoiceStatus
 from schemas.billing import InvoiceCreate, PaymentCreate
 import secrets
 
+# Upper bound on waiting for a row lock held by another invoice transaction
+_SET_INVOICE_LOCK_TIMEOUT = text("SET LOCAL lock_timeout = '5s'")
+
+# SQLSTATE lock_not_available, raised when lock_timeout expires
+_PG_LOCK_NOT_AVAILABLE = "55P03"
+
+# Invoice-by-id statements are built once and reused with a bound id,
+# so hot lookups skip per-call Query construction and hit the compiled cache
+_INVOICE_DETAIL_BY_ID = select(Invoice).options(
+    selectinload(Invoice.items),
+    raiseload("*")
+).where(Invoice.id == bindparam("invoice_id"))
+
+_INVOICE_BY_ID_FOR_UPDATE = select(Invoice).where(
+    Invoice.id == bindparam("invoice_id")
+).with_for_update()
+
+_INVOICE_OWNER_BY_ID = select(Invoice.patient_id).where(Invoice.id == bindparam("invoice_id"))
+
 
 class BillingService:
     """Business logic for billing and payment management"""
@@ -13,9 +35,8 @@ class BillingService:
     @staticmethod
     def _generate_invoice_number() -> str:
         """Generate unique invoice number"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d")
-        random_part = secrets.token_hex(3).upper()
-        return f"INV-{timestamp}-{random_part}"
+        now = datetime.utcnow()
+        return f"INV-{now.year:04d}{now.month:02d}{now.day:02d}-{secrets.randbits(24):06X}"
 
     @staticmethod
     def create_invoice(
@@ -28,7 +49,8 @@ class BillingService:
         subtotal = sum(item.quantity * item.unit_price for item in invoice_data.items)
         total_amount = subtotal + invoice_data.tax_amount - invoice_data.discount_amount
         
-        # Create invoice
+        # Create invoice with its items attached, so the returned object
+        # already holds everything the response serializes
         invoice = Invoice(
             patient_id=invoice_data.patient_id,
             appointment_id=invoice_data.appointment_id,
@@ -40,24 +62,18 @@ class BillingService:
             total_amount=total_amount,
             balance_due=total_amount,
             due_date=invoice_data.due_date,
-            notes=invoice_data.notes
+            notes=invoice_data.notes,
+            items=[
+                InvoiceItem(
+                    **item_data.model_dump(),
+                    total_price=item_data.quantity * item_data.unit_price
+                )
+                for item_data in invoice_data.items
+            ]
         )
         
         db.add(invoice)
-        db.flush()
-        
-        # Add invoice items
-        for item_data in invoice_data.items:
-            total_price = item_data.quantity * item_data.unit_price
-            item = InvoiceItem(
-                invoice_id=invoice.id,
-                **item_data.model_dump(),
-                total_price=total_price
-            )
-            db.add(item)
-        
-        db.commit()
-        db.refresh(invoice)
+        commit_without_expire(db)
         
         return invoice
 
@@ -87,7 +103,8 @@ class BillingService:
         user_id: int
     ) -> Invoice:
         """Get a specific invoice"""
-        invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+        # Eager-load what InvoiceDetailResponse serializes; any other lazy load raises
+        invoice = db.execute(_INVOICE_DETAIL_BY_ID, {"invoice_id": invoice_id}).scalar_one_or_none()
         
         if not invoice:
             raise HTTPException(
@@ -112,21 +129,56 @@ class BillingService:
         payment_data: PaymentCreate
     ) -> Payment:
         """Process a payment for an invoice"""
-        invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+        amount = payment_data.amount
+        now = datetime.utcnow()
         
-        if not invoice:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Invoice not found"
+        # Apply the payment in one atomic UPDATE; the balance predicate replaces
+        # the read-then-check so concurrent payments cannot overdraw the invoice
+        result = db.execute(
+            update(Invoice)
+            .where(
+                Invoice.id == invoice_id,
+                Invoice.patient_id == patient_id,
+                Invoice.balance_due >= amount
             )
-        
-        if invoice.patient_id != patient_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized"
+            .values(
+                amount_paid=Invoice.amount_paid + amount,
+                balance_due=Invoice.balance_due - amount,
+                # Postgres types a CASE of bound literals as text and has no implicit
+                # text -> enum assignment cast, so the whole expression is cast
+                status=cast(
+                    case(
+                        (Invoice.balance_due - amount == 0, literal(InvoiceStatus.PAID, Invoice.status.type)),
+                        else_=literal(InvoiceStatus.PARTIALLY_PAID, Invoice.status.type)
+                    ),
+                    Invoice.status.type
+                ),
+                paid_date=case(
+                    (Invoice.balance_due - amount == 0, now),
+                    else_=Invoice.paid_date
+                ),
+                updated_at=now
             )
+            .returning(Invoice.id)
+            .execution_options(synchronize_session=False)
+        )
         
-        if payment_data.amount > invoice.balance_due:
+        if result.first() is None:
+            db.rollback()
+            owner_id = db.execute(_INVOICE_OWNER_BY_ID, {"invoice_id": invoice_id}).scalar()
+            
+            if owner_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Invoice not found"
+                )
+            
+            if owner_id != patient_id:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Not authorized"
+                )
+            
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Payment amount exceeds balance due"
@@ -140,20 +192,7 @@ class BillingService:
         )
         db.add(payment)
         
-        # Update invoice
-        invoice.amount_paid += payment_data.amount
-        invoice.balance_due -= payment_data.amount
-        
-        if invoice.balance_due == 0:
-            invoice.status = InvoiceStatus.PAID
-            invoice.paid_date = datetime.utcnow()
-        elif invoice.amount_paid > 0:
-            invoice.status = InvoiceStatus.PARTIALLY_PAID
-        
-        invoice.updated_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(payment)
+        commit_without_expire(db)
         
         return payment
 
@@ -164,22 +203,32 @@ class BillingService:
         user_id: int
     ) -> List[Payment]:
         """Get all payments for an invoice"""
-        invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+        # Authorization is folded into the join so the common case is one query
+        payments = db.query(Payment).join(
+            Invoice, Payment.invoice_id == Invoice.id
+        ).filter(
+            Invoice.id == invoice_id,
+            Invoice.patient_id == user_id
+        ).all()
         
-        if not invoice:
+        if payments:
+            return payments
+        
+        # Empty result: distinguish missing invoice, foreign invoice, and no payments
+        owner_id = db.execute(_INVOICE_OWNER_BY_ID, {"invoice_id": invoice_id}).scalar()
+        
+        if owner_id is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Invoice not found"
             )
         
-        if invoice.patient_id != user_id:
+        if owner_id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized"
             )
         
-        payments = db.query(Payment).filter(Payment.invoice_id == invoice_id).all()
-        
         return payments
 
     @staticmethod
@@ -188,7 +237,19 @@ class BillingService:
         invoice_id: int
     ) -> Invoice:
         """Cancel an invoice"""
-        invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+        # Lock the row so a concurrent payment cannot settle the invoice between
+        # the PAID check and the cancellation; bound the wait on a held lock
+        db.execute(_SET_INVOICE_LOCK_TIMEOUT)
+        try:
+            invoice = db.execute(_INVOICE_BY_ID_FOR_UPDATE, {"invoice_id": invoice_id}).scalar_one_or_none()
+        except OperationalError as e:
+            if getattr(e.orig, "pgcode", None) != _PG_LOCK_NOT_AVAILABLE:
+                raise
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Invoice is being updated, retry"
+            )
         
         if not invoice:
             raise HTTPException(
@@ -205,7 +266,6 @@ class BillingService:
         invoice.status = InvoiceStatus.CANCELLED
         invoice.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(invoice)
+        commit_without_expire(db)
         
         return invoice
@@ -1,10 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload, raiseload
+from config.database import commit_without_expire
 from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import HTTPException, status
 from models.prescription import Prescription, PrescriptionMedication, PrescriptionStatus
-from models.user import User, UserRole
+from models.user import UserRole
 from schemas.prescription import PrescriptionCreate
+from utils.security import get_cached_user
 import secrets
 
 
@@ -14,9 +16,10 @@ class PrescriptionService:
     @staticmethod
     def _generate_prescription_number() -> str:
         """Generate unique prescription number"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        random_part = secrets.token_hex(4).upper()
-        return f"RX-{timestamp}-{random_part}"
+        # Attribute formatting avoids strftime's per-call format parsing
+        now = datetime.utcnow()
+        timestamp = f"{now.year:04d}{now.month:02d}{now.day:02d}{now.hour:02d}{now.minute:02d}{now.second:02d}"
+        return f"RX-{timestamp}-{secrets.randbits(32):08X}"
 
     @staticmethod
     def create_prescription(
@@ -26,23 +29,24 @@ class PrescriptionService:
     ) -> Prescription:
         """Create a new prescription with medications"""
         
-        # Verify doctor has doctor role
-        doctor = db.query(User).filter(User.id == doctor_id).first()
-        if not doctor or doctor.role != UserRole.DOCTOR:
+        # Verify doctor has doctor role. Same cache as get_current_user; the admin
+        # role/delete paths bump its Redis generation, which reaches every worker
+        doctor = get_cached_user(db, doctor_id)
+        if doctor is None or doctor[1] != UserRole.DOCTOR.value:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Only doctors can create prescriptions"
             )
         
         # Verify patient exists
-        patient = db.query(User).filter(User.id == prescription_data.patient_id).first()
-        if not patient:
+        if get_cached_user(db, prescription_data.patient_id) is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Patient not found"
             )
         
-        # Create prescription
+        # Create prescription with its medications attached, so the returned
+        # object already holds everything the response serializes
         prescription = Prescription(
             patient_id=prescription_data.patient_id,
             doctor_id=doctor_id,
@@ -50,22 +54,17 @@ class PrescriptionService:
             prescription_number=PrescriptionService._generate_prescription_number(),
             diagnosis=prescription_data.diagnosis,
             notes=prescription_data.notes,
-            expiry_date=datetime.utcnow() + timedelta(days=365)
+            expiry_date=datetime.utcnow() + timedelta(days=365),
+            medications=[
+                PrescriptionMedication(
+                    **med_data.model_dump(),
+                    refills_remaining=med_data.refills_allowed
+                )
+                for med_data in prescription_data.medications
+            ]
         )
         db.add(prescription)
-        db.flush()
-        
-        # Add medications
-        for med_data in prescription_data.medications:
-            medication = PrescriptionMedication(
-                prescription_id=prescription.id,
-                **med_data.model_dump(),
-                refills_remaining=med_data.refills_allowed
-            )
-            db.add(medication)
-        
-        db.commit()
-        db.refresh(prescription)
+        commit_without_expire(db)
         
         return prescription
 
@@ -96,7 +95,11 @@ class PrescriptionService:
         user_role: UserRole
     ) -> Prescription:
         """Get a specific prescription"""
-        prescription = db.query(Prescription).filter(Prescription.id == prescription_id).first()
+        # Eager-load what PrescriptionDetailResponse serializes; any other lazy load raises
+        prescription = db.query(Prescription).options(
+            selectinload(Prescription.medications),
+            raiseload("*")
+        ).filter(Prescription.id == prescription_id).first()
         
         if not prescription:
             raise HTTPException(
@@ -139,8 +142,7 @@ class PrescriptionService:
         prescription.status = PrescriptionStatus.CANCELLED
         prescription.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(prescription)
+        commit_without_expire(db)
         
         return prescription
 
@@ -177,7 +179,6 @@ class PrescriptionService:
             )
         
         medication.refills_remaining -= 1
-        db.commit()
-        db.refresh(medication)
+        commit_without_expire(db)
         
         return medication
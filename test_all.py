@@ -2,8 +2,26 @@ import requests
 import json
 import time
 import sys
+import redis
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:8000"
+REDIS_HOST = "localhost"
+REDIS_PORT = 6379
+
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+# Reuse one keep-alive connection for every request
+session = requests.Session()
+
+def wait_for_verification_code(email, attempts=50, interval=0.05):
+    """Poll the pending registration in Redis until its verification code appears"""
+    for _ in range(attempts):
+        data = redis_client.get(f"registration:{email}")
+        if data:
+            return json.loads(data)["code"]
+        time.sleep(interval)
+    return None
 
 def run_full_test():
     # 1. Signup
@@ -12,45 +30,38 @@ def run_full_test():
     password = "InitialPassword123!"
     
     print(f"--- STEP 1: Signup for {email} ---")
-    r = requests.post(f"{BASE_URL}/auth/signup", json={"email": email, "password": password})
+    r = session.post(f"{BASE_URL}/auth/signup", json={"email": email, "password": password})
     if r.status_code not in [200, 201]:
         print(f"Signup failed: {r.text}")
         return
     
-    print("Signup initiated. Please wait for verification code to appear in server logs...")
-    print("I will search the logs now...")
-    
-    # Wait for reloader and logs
-    time.sleep(5)
+    print("Signup initiated. Reading verification code from Redis...")
+    code = wait_for_verification_code(email)
     
-    # Normally I would read logs here, but since I'm the one writing this, 
-    # I'll just tell the user to provide it if I can't automate it.
-    # ACTUALLY, I'll use a placeholder for now and I'll fill it in the next execution.
-    # OR, I'll use a small trick: I'll print a message and exit.
+    if code:
+        continue_test(email, password, code)
+        return
     
     print("\n[ACTION REQUIRED] Search the server logs for 'DEBUG - CODE: XXXXXX'")
     print(f"Then run: python test_all.py {email} {password} <CODE>")
 
 def continue_test(email, password, code):
-    headers = {}
-    
     print(f"\n--- STEP 2: Verify {email} with code {code} ---")
-    r = requests.post(f"{BASE_URL}/auth/verify-email", json={"email": email, "code": code})
+    r = session.post(f"{BASE_URL}/auth/verify-email", json={"email": email, "code": code})
     if r.status_code != 200:
         print(f"Verification failed: {r.text}")
         return
 
     print("\n--- STEP 3: Initial Login ---")
-    r = requests.post(f"{BASE_URL}/auth/login", json={"email": email, "password": password})
+    r = session.post(f"{BASE_URL}/auth/login", json={"email": email, "password": password})
     if r.status_code != 200:
         print(f"Login failed: {r.status_code} {r.text}")
         return
     
     token = r.json()["access_token"]
-    headers = {"Authorization": f"Bearer {token}"}
+    session.headers.update({"Authorization": f"Bearer {token}"})
     print("✓ Login successful")
 
-    print("\n--- STEP 4: Profile Management ---")
     profile_data = {
         "first_name": "Antigravity",
         "last_name": "Tester",
@@ -62,30 +73,52 @@ def continue_test(email, password, code):
         "emergency_contact_name": "System Admin",
         "emergency_contact_phone": "+0987654321"
     }
-    r = requests.post(f"{BASE_URL}/api/v1/users/me/profile", json=profile_data, headers=headers)
-    print(f"Profile Create: {r.status_code}")
-    
-    r = requests.get(f"{BASE_URL}/api/v1/users/me/profile", headers=headers)
-    print(f"Profile Read (Decrypted): {r.status_code}")
-    print(json.dumps(r.json(), indent=2))
+
+    # requests.Session is not thread-safe, so each worker gets its own
+    # carrying the login's auth header and cookies
+    def worker_session():
+        worker = requests.Session()
+        worker.headers.update(session.headers)
+        worker.cookies.update(session.cookies)
+        return worker
+
+    def profile_steps():
+        with worker_session() as worker:
+            created = worker.post(f"{BASE_URL}/api/v1/users/me/profile", json=profile_data)
+            read = worker.get(f"{BASE_URL}/api/v1/users/me/profile")
+        return created, read
+
+    def device_steps():
+        with worker_session() as worker:
+            return worker.get(f"{BASE_URL}/api/v1/users/me/devices")
+
+    # STEP 4 and STEP 5 only depend on the login, so run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        profile_future = executor.submit(profile_steps)
+        devices_future = executor.submit(device_steps)
+        profile_create, profile_read = profile_future.result()
+        devices = devices_future.result()
+
+    print("\n--- STEP 4: Profile Management ---")
+    print(f"Profile Create: {profile_create.status_code}")
+    print(f"Profile Read (Decrypted): {profile_read.status_code}")
+    print(json.dumps(profile_read.json(), indent=2))
 
     print("\n--- STEP 5: Device Management ---")
-    r = requests.get(f"{BASE_URL}/api/v1/users/me/devices", headers=headers)
-    print(f"Devices List: {r.status_code}")
-    print(json.dumps(r.json(), indent=2))
+    print(f"Devices List: {devices.status_code}")
+    print(json.dumps(devices.json(), indent=2))
 
     print("\n--- STEP 6: Password Change ---")
     new_password = "UpgradedPassword456!"
-    r = requests.post(f"{BASE_URL}/api/v1/users/me/change-password", 
-                     json={"current_password": password, "new_password": new_password}, 
-                     headers=headers)
+    r = session.post(f"{BASE_URL}/api/v1/users/me/change-password", 
+                     json={"current_password": password, "new_password": new_password})
     print(f"Password Change: {r.status_code} {r.text}")
 
     if r.status_code == 200:
         print("\n--- STEP 7: Login with NEW Password ---")
         # Small delay to ensure DB commit is visible
         time.sleep(1)
-        r = requests.post(f"{BASE_URL}/auth/login", json={"email": email, "password": new_password})
+        r = session.post(f"{BASE_URL}/auth/login", json={"email": email, "password": new_password})
         print(f"New Password Login: {r.status_code}")
         if r.status_code == 200:
             print("🎉 ALL TESTS PASSED!")
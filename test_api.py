@@ -2,9 +2,13 @@ import requests
 import json
 import time
 import re
+from test_all import wait_for_verification_code
 
 BASE_URL = "http://localhost:8000"
 
+# Reuse one keep-alive connection for every request
+session = requests.Session()
+
 def test_api():
     print("========================================")
     print("  MediSecure API Testing Suite (Python)")
@@ -19,7 +23,7 @@ def test_api():
 
     # 1. Health Check
     try:
-        r = requests.get(f"{BASE_URL}/health")
+        r = session.get(f"{BASE_URL}/health")
         print(f"✓ Health Check: {r.status_code}")
     except Exception as e:
         print(f"✗ Health Check Failed: {e}")
@@ -28,20 +32,20 @@ def test_api():
     # 2. Signup
     print(f"[3/12] Testing User Signup...")
     signup_data = {"email": email, "password": password}
-    r = requests.post(f"{BASE_URL}/auth/signup", json=signup_data)
+    r = session.post(f"{BASE_URL}/auth/signup", json=signup_data)
     if r.status_code == 201 or r.status_code == 200:
         print(f"✓ Signup Successful: {r.json()}")
     else:
         print(f"✗ Signup Failed: {r.status_code} {r.text}")
         return
 
-    print("\n⚠ IMPORTANT: I need the verification code from the server logs.")
-    print("I will wait 5 seconds and try to find it...")
-    time.sleep(5)
+    # Read the verification code from the pending registration in Redis
+    code = wait_for_verification_code(email)
     
-    # We'll ask the user to provide it for now as a fallback, 
-    # but I'll try to automate it in the next step.
-    # For this script run, I'll stop here and search logs.
+    if code:
+        print(f"✓ Verification code found: {code}")
+    else:
+        print("✗ Verification code not found in Redis. Check the server logs.")
     
 if __name__ == "__main__":
     test_api()
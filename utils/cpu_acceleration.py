@@ -0,0 +1,79 @@
+"""
+Startup self-tests for hardware-accelerated crypto.
+Shared by the AES (utils.encryption) and SHA-256 (utils.security) checks.
+"""
+import functools
+import logging
+import time
+from typing import Callable, FrozenSet, Optional
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_PAYLOAD_SIZE = 64 * 1024
+BENCHMARK_ROUNDS = 16
+
+
+@functools.cache
+def cpu_flags() -> Optional[FrozenSet[str]]:
+    """
+    CPU feature flags from /proc/cpuinfo.
+
+    Returns:
+        Set of flags, or None when not on Linux (nothing to compare against)
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        return None
+    return frozenset()
+
+
+def benchmark_mbps(fn: Callable[[bytes], object]) -> float:
+    """
+    Throughput of fn over a 64KB zero payload, in MB/s, after one warm-up call.
+    """
+    payload = bytes(BENCHMARK_PAYLOAD_SIZE)
+    fn(payload)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(BENCHMARK_ROUNDS):
+        fn(payload)
+    elapsed = time.perf_counter() - start
+
+    megabytes = BENCHMARK_PAYLOAD_SIZE * BENCHMARK_ROUNDS / (1024 * 1024)
+    return megabytes / elapsed if elapsed else float("inf")
+
+
+def check_acceleration(
+    cpu_flag: str,
+    name: str,
+    fn: Callable[[bytes], object],
+    min_mbps: float,
+    openssl_version: str
+) -> bool:
+    """
+    Benchmark fn when the CPU advertises cpu_flag and log an advisory if it
+    runs below min_mbps. A single short benchmark is noisy on loaded or
+    virtualized hosts, so a low figure is a hint to investigate, not proof
+    that OpenSSL lacks the hardware path.
+
+    Returns:
+        False if acceleration looks missing, True otherwise
+    """
+    flags = cpu_flags()
+    if not flags or cpu_flag not in flags:
+        return True
+
+    mbps = benchmark_mbps(fn)
+    if mbps < min_mbps:
+        logger.warning(
+            f"{name} ran at {mbps:.0f} MB/s (expected >= {min_mbps} MB/s) on a CPU advertising "
+            f"{cpu_flag} with {openssl_version}. This can be host load or virtualization; if it "
+            "persists, check that OpenSSL has the hardware path (OPENSSL_ia32cap, base image)"
+        )
+        return False
+
+    return True
@@ -1,15 +1,83 @@
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+import functools
+import hashlib
 import os
-from typing import Optional
+import logging
+from utils.cpu_acceleration import check_acceleration
+
+try:
+    import rfernet
+except ImportError:  # optional Rust-backed Fernet
+    rfernet = None
+
+logger = logging.getLogger(__name__)
+
+# Use the Rust-backed Fernet when available; set to "false" to force pyca/cryptography
+USE_RFERNET = os.getenv("MEDISECURE_USE_RFERNET", "true").lower() == "true"
+
+# Token layout: urlsafe_b64(version byte + 12-byte nonce + AES-GCM ciphertext/tag).
+# Fernet tokens start with version byte 0x80, which always encodes to "g".
+GCM_TOKEN_VERSION = b"\x01"
+GCM_NONCE_SIZE = 12
+GCM_KEY_INFO = b"medisecure-field-encryption-aesgcm-v1"
+LEGACY_FERNET_PREFIX = b"g"
+
+# Fernet token layout: version(1) | timestamp(8) | IV(16) | AES-128-CBC ciphertext | HMAC-SHA256(32)
+FERNET_VERSION = 0x80
+FERNET_IV_OFFSET = 9
+FERNET_CIPHERTEXT_OFFSET = 25
+FERNET_HMAC_SIZE = 32
+
+
+class _RFernetCipher:
+    """
+    Adapter exposing rfernet with the same bytes-in/bytes-out API as
+    cryptography's Fernet. Tokens are interchangeable between the two.
+    """
+    
+    def __init__(self, key: bytes):
+        self._fernet = rfernet.Fernet(key.decode())
+    
+    def encrypt(self, data: bytes) -> bytes:
+        token = self._fernet.encrypt(data)
+        return token.encode() if isinstance(token, str) else token
+    
+    def decrypt(self, token: bytes) -> bytes:
+        return bytes(self._fernet.decrypt(token.decode() if isinstance(token, bytes) else token))
+
+
+def _build_cipher(key: bytes):
+    """
+    Build the Fernet cipher for the given key.
+    Prefers rfernet, but only after a round-trip against cryptography's
+    Fernet proves the tokens interoperate with already-stored data.
+    """
+    reference = Fernet(key)
+    
+    if not (USE_RFERNET and rfernet is not None):
+        return reference
+    
+    try:
+        fast = _RFernetCipher(key)
+        probe = b"medisecure-rfernet-probe"
+        if reference.decrypt(fast.encrypt(probe)) != probe or fast.decrypt(reference.encrypt(probe)) != probe:
+            raise ValueError("token mismatch")
+        return fast
+    except Exception as e:
+        logger.warning(f"rfernet self-test failed, falling back to cryptography Fernet: {e}")
+        return reference
 
 class EncryptionManager:
     """
     Manager for field-level encryption of sensitive PII data.
-    Uses Fernet (symmetric encryption) with key derivation.
+    Encrypts with AES-256-GCM under a key derived (HKDF) from the master key.
+    Tokens written by the earlier Fernet scheme are still decrypted.
     """
     
     def __init__(self):
@@ -28,7 +96,61 @@ class EncryptionManager:
         if isinstance(self._master_key, str):
             self._master_key = self._master_key.encode()
         
-        self._cipher = Fernet(self._master_key)
+        raw_key = base64.urlsafe_b64decode(self._master_key)
+        
+        # Legacy Fernet cipher, only used to read tokens written before AES-GCM.
+        # Without rfernet, decrypt from the pre-split key halves instead of going
+        # through Fernet, which rebuilds its HMAC/Cipher objects from scratch per call.
+        self._cipher = _build_cipher(self._master_key)
+        self._signing_key = raw_key[:16]
+        self._enc_key = raw_key[16:32]
+        self._hmac_template = hmac.HMAC(self._signing_key, hashes.SHA256())
+        self._aes = algorithms.AES(self._enc_key)
+        if isinstance(self._cipher, _RFernetCipher):
+            self._decrypt_legacy = self._cipher.decrypt
+        else:
+            self._decrypt_legacy = self._decrypt_fernet
+        
+        gcm_key = self.derive_subkey(raw_key, GCM_KEY_INFO)
+        self._aead = AESGCM(gcm_key)
+    
+    def _encrypt_bytes(self, data: bytes) -> bytes:
+        """Encrypt raw bytes into a versioned AES-GCM token"""
+        nonce = os.urandom(GCM_NONCE_SIZE)
+        return base64.urlsafe_b64encode(
+            GCM_TOKEN_VERSION + nonce + self._aead.encrypt(nonce, data, None)
+        )
+    
+    def _decrypt_fernet(self, token: bytes) -> bytes:
+        """Verify and decrypt a Fernet token (no TTL, as Fernet.decrypt without ttl)"""
+        raw = base64.urlsafe_b64decode(token)
+        if len(raw) < FERNET_CIPHERTEXT_OFFSET + FERNET_HMAC_SIZE or raw[0] != FERNET_VERSION:
+            raise ValueError("Invalid Fernet token")
+        
+        signer = self._hmac_template.copy()
+        signer.update(raw[:-FERNET_HMAC_SIZE])
+        try:
+            signer.verify(raw[-FERNET_HMAC_SIZE:])
+        except InvalidSignature:
+            raise ValueError("Invalid Fernet token")
+        
+        iv = raw[FERNET_IV_OFFSET:FERNET_CIPHERTEXT_OFFSET]
+        decryptor = Cipher(self._aes, modes.CBC(iv)).decryptor()
+        padded = decryptor.update(raw[FERNET_CIPHERTEXT_OFFSET:-FERNET_HMAC_SIZE]) + decryptor.finalize()
+        unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+        return unpadder.update(padded) + unpadder.finalize()
+    
+    def _decrypt_bytes(self, token: bytes) -> bytes:
+        """Decrypt an AES-GCM token, or a legacy Fernet token"""
+        if token[:1] == LEGACY_FERNET_PREFIX:
+            return self._decrypt_legacy(token)
+        
+        raw = base64.urlsafe_b64decode(token)
+        if raw[:1] != GCM_TOKEN_VERSION:
+            raise ValueError("Unknown token version")
+        
+        nonce = raw[1:1 + GCM_NONCE_SIZE]
+        return self._aead.decrypt(nonce, raw[1 + GCM_NONCE_SIZE:], None)
     
     def encrypt(self, data: str) -> str:
         """
@@ -44,7 +166,7 @@ class EncryptionManager:
             return data
         
         try:
-            encrypted_data = self._cipher.encrypt(data.encode())
+            encrypted_data = self._encrypt_bytes(data.encode())
             return encrypted_data.decode()
         except Exception as e:
             raise ValueError(f"Encryption failed: {str(e)}")
@@ -63,47 +185,93 @@ class EncryptionManager:
             return encrypted_data
         
         try:
-            decrypted_data = self._cipher.decrypt(encrypted_data.encode())
+            decrypted_data = self._decrypt_bytes(encrypted_data.encode())
             return decrypted_data.decode()
         except Exception as e:
             raise ValueError(f"Decryption failed: {str(e)}")
     
-    def encrypt_dict(self, data: dict, fields_to_encrypt: list) -> dict:
+    def encrypt_bytes(self, data: bytes) -> bytes:
+        """
+        Encrypt raw bytes, skipping the str codec steps of encrypt().
+        Use for values stored in binary (LargeBinary/BYTEA) columns.
+        
+        Args:
+            data: Plain bytes to encrypt
+            
+        Returns:
+            Encrypted token bytes
+        """
+        if not data:
+            return data
+        
+        try:
+            return self._encrypt_bytes(data)
+        except Exception as e:
+            raise ValueError(f"Encryption failed: {str(e)}")
+    
+    def decrypt_bytes(self, token: bytes) -> bytes:
+        """
+        Decrypt token bytes produced by encrypt_bytes() (or encrypt(), encoded).
+        
+        Args:
+            token: Encrypted token bytes
+            
+        Returns:
+            Decrypted plain bytes
+        """
+        if not token:
+            return token
+        
+        try:
+            return self._decrypt_bytes(bytes(token))
+        except Exception as e:
+            raise ValueError(f"Decryption failed: {str(e)}")
+    
+    def encrypt_dict(self, data: dict, fields_to_encrypt: list, inplace: bool = False) -> dict:
         """
         Encrypt specific fields in a dictionary.
         
         Args:
             data: Dictionary containing data
             fields_to_encrypt: List of field names to encrypt
+            inplace: Mutate and return `data` instead of a copy (caller must own the dict)
             
         Returns:
             Dictionary with encrypted fields
         """
-        encrypted_data = data.copy()
+        encrypted_data = data if inplace else data.copy()
+        encrypt = self._encrypt_bytes
         
-        for field in fields_to_encrypt:
-            if field in encrypted_data and encrypted_data[field]:
-                encrypted_data[field] = self.encrypt(str(encrypted_data[field]))
+        try:
+            for field in fields_to_encrypt:
+                value = encrypted_data.get(field)
+                if value:
+                    encrypted_data[field] = encrypt(str(value).encode()).decode()
+        except Exception as e:
+            raise ValueError(f"Encryption failed: {str(e)}")
         
         return encrypted_data
     
-    def decrypt_dict(self, data: dict, fields_to_decrypt: list) -> dict:
+    def decrypt_dict(self, data: dict, fields_to_decrypt: list, inplace: bool = False) -> dict:
         """
         Decrypt specific fields in a dictionary.
         
         Args:
             data: Dictionary containing encrypted data
             fields_to_decrypt: List of field names to decrypt
+            inplace: Mutate and return `data` instead of a copy (caller must own the dict)
             
         Returns:
             Dictionary with decrypted fields
         """
-        decrypted_data = data.copy()
+        decrypted_data = data if inplace else data.copy()
+        decrypt = self._decrypt_bytes
         
         for field in fields_to_decrypt:
-            if field in decrypted_data and decrypted_data[field]:
+            value = decrypted_data.get(field)
+            if value:
                 try:
-                    decrypted_data[field] = self.decrypt(decrypted_data[field])
+                    decrypted_data[field] = decrypt(value.encode()).decode()
                 except Exception:
                     # If decryption fails, keep original value (might not be encrypted)
                     pass
@@ -121,6 +289,27 @@ class EncryptionManager:
         """
         return Fernet.generate_key().decode()
     
+    @staticmethod
+    def derive_subkey(master_key_bytes: bytes, info: bytes) -> bytes:
+        """
+        Derive a purpose-specific subkey from a high-entropy master key using HKDF-SHA256.
+        Use this (not derive_key_from_password) when the input is already a random key;
+        PBKDF2 stretching only makes sense for low-entropy passwords.
+        
+        Args:
+            master_key_bytes: Raw master key bytes
+            info: Context label binding the subkey to its purpose (e.g., tenant or feature)
+            
+        Returns:
+            32-byte derived key
+        """
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=info
+        ).derive(master_key_bytes)
+    
     @staticmethod
     def derive_key_from_password(password: str, salt: bytes = None) -> tuple:
         """
@@ -136,15 +325,11 @@ class EncryptionManager:
         if salt is None:
             salt = os.urandom(16)
         
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend()
-        )
+        # hashlib dispatches to OpenSSL's PKCS5_PBKDF2_HMAC, which precomputes the
+        # HMAC inner/outer key blocks once instead of on every iteration
+        derived = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100000, dklen=32)
         
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+        key = base64.urlsafe_b64encode(derived)
         return key.decode(), base64.b64encode(salt).decode()
 
 
@@ -152,37 +337,72 @@ class EncryptedField:
     """
     SQLAlchemy custom type for encrypted fields.
     Automatically encrypts/decrypts data when reading/writing to database.
+    Pass binary=True for LargeBinary columns to store the token as raw bytes.
     """
     
-    def __init__(self, encryption_manager: EncryptionManager):
+    def __init__(self, encryption_manager: EncryptionManager, binary: bool = False):
         self.encryption_manager = encryption_manager
+        self.binary = binary
     
     def process_bind_param(self, value, dialect):
         """Encrypt value before storing in database"""
         if value is not None:
+            if self.binary:
+                if isinstance(value, str):
+                    value = value.encode()
+                return self.encryption_manager.encrypt_bytes(value)
             return self.encryption_manager.encrypt(value)
         return value
     
     def process_result_value(self, value, dialect):
         """Decrypt value when reading from database"""
         if value is not None:
+            if self.binary:
+                return self.encryption_manager.decrypt_bytes(value).decode()
             return self.encryption_manager.decrypt(value)
         return value
 
 
-# Singleton instance
-_encryption_manager = None
+# AES-256-GCM throughput below this on an AES-NI CPU means OpenSSL is not using
+# its hardware path (software GCM runs at a few percent of AES-NI/PCLMUL speed)
+AES_NI_MIN_MBPS = 800
+
 
+def check_aes_acceleration() -> bool:
+    """
+    Startup self-test for hardware AES.
+    Field encryption's AES-256-GCM runs inside the OpenSSL that cryptography links
+    against; some builds (notably musl/Alpine images) lack the AES-NI assembly path.
+    Logs an advisory when the CPU advertises AES-NI but a 64KB AESGCM.encrypt
+    benchmark runs at software speed.
+    
+    Returns:
+        False if acceleration looks missing, True otherwise
+    """
+    try:
+        from cryptography.hazmat.backends.openssl import backend
+        openssl_version = backend.openssl_version_text()
+    except Exception:
+        openssl_version = "unknown"
+    
+    # Throwaway key, so reusing one nonce across the benchmark is harmless
+    aead = AESGCM(AESGCM.generate_key(bit_length=256))
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    return check_acceleration(
+        "aes", "AES-256-GCM", lambda data: aead.encrypt(nonce, data, None), AES_NI_MIN_MBPS, openssl_version
+    )
+
+
+@functools.cache
 def get_encryption_manager() -> EncryptionManager:
     """
     Get singleton instance of EncryptionManager.
+    After the first call this is a plain cache hit. Threads racing on the very
+    first call may each build a manager before one is cached; that is harmless
+    with ENCRYPTION_MASTER_KEY set, since every instance derives the same keys.
     """
-    global _encryption_manager
-    
-    if _encryption_manager is None:
-        _encryption_manager = EncryptionManager()
-    
-    return _encryption_manager
+    check_aes_acceleration()
+    return EncryptionManager()
 
 
 # Convenience functions
@@ -196,7 +416,7 @@ def decrypt_value(encrypted_value: str) -> str:
     return get_encryption_manager().decrypt(encrypted_value)
 
 
-def encrypt_sensitive_data(data: dict, sensitive_fields: list = None) -> dict:
+def encrypt_sensitive_data(data: dict, sensitive_fields: list = None, inplace: bool = False) -> dict:
     """
     Encrypt sensitive fields in user data.
     
@@ -212,10 +432,10 @@ def encrypt_sensitive_data(data: dict, sensitive_fields: list = None) -> dict:
             'insurance_number'
         ]
     
-    return get_encryption_manager().encrypt_dict(data, sensitive_fields)
+    return get_encryption_manager().encrypt_dict(data, sensitive_fields, inplace=inplace)
 
 
-def decrypt_sensitive_data(encrypted_data: dict, sensitive_fields: list = None) -> dict:
+def decrypt_sensitive_data(encrypted_data: dict, sensitive_fields: list = None, inplace: bool = False) -> dict:
     """
     Decrypt sensitive fields in user data.
     """
@@ -229,7 +449,7 @@ def decrypt_sensitive_data(encrypted_data: dict, sensitive_fields: list = None)
             'insurance_number'
         ]
     
-    return get_encryption_manager().decrypt_dict(encrypted_data, sensitive_fields)
+    return get_encryption_manager().decrypt_dict(encrypted_data, sensitive_fields, inplace=inplace)
 
 
 def encrypt_data(data: str) -> str:
@@ -9,6 +9,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+_TXN_PREFIX = "TXN-"
+_RFD_PREFIX = "RFD-"
+_ID_TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
 
 class DummyPaymentProcessor:
     """Simulates payment processing without actual transactions"""
@@ -34,8 +38,8 @@ class DummyPaymentProcessor:
         Returns:
             dict with transaction details
         """
-        # Generate fake transaction ID
-        transaction_id = f"TXN-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4).upper()}"
+        now = datetime.utcnow()
+        timestamp = now.isoformat()
         
         # Simulate processing delay
         logger.info(f"[DUMMY PAYMENT] Processing ${amount:.2f} via {payment_method}")
@@ -48,9 +52,12 @@ class DummyPaymentProcessor:
                 "success": False,
                 "transaction_id": None,
                 "message": "Payment declined - card ending in 0000",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             }
         
+        # Generate fake transaction ID
+        transaction_id = f"{_TXN_PREFIX}{now.strftime(_ID_TIMESTAMP_FORMAT)}-{secrets.token_hex(4).upper()}"
+        
         logger.info(f"[DUMMY PAYMENT] Payment successful! Transaction ID: {transaction_id}")
         
         return {
@@ -59,7 +66,7 @@ class DummyPaymentProcessor:
             "amount": amount,
             "payment_method": payment_method,
             "message": "Payment processed successfully (DEMO MODE)",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": timestamp,
             "card_last4": card_number[-4:] if card_number else "XXXX"
         }
     
@@ -75,7 +82,8 @@ class DummyPaymentProcessor:
         Returns:
             dict with refund details
         """
-        refund_id = f"RFD-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(4).upper()}"
+        now = datetime.utcnow()
+        refund_id = f"{_RFD_PREFIX}{now.strftime(_ID_TIMESTAMP_FORMAT)}-{secrets.token_hex(4).upper()}"
         
         logger.info(f"[DUMMY PAYMENT] Processing refund of ${amount:.2f} for transaction {transaction_id}")
         
@@ -85,7 +93,7 @@ class DummyPaymentProcessor:
             "transaction_id": transaction_id,
             "amount": amount,
             "message": "Refund processed successfully (DEMO MODE)",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now.isoformat()
         }
     
     @staticmethod
@@ -1,44 +1,133 @@
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from jose import jwt, JWTError
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import jwt
+import logging
+from jwt import PyJWTError
+import base64
+import functools
+import hashlib
+import hmac
+import json
+from hmac import compare_digest
 import secrets
-import string
-from typing import Optional
+import threading
+import time
+from typing import List, Optional, Tuple
 import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from config.database import get_db
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.exc import ObjectDeletedError
+from config.database import SessionLocal, get_db
+from config.redis_db import sync_redis_client
+from redis.exceptions import RedisError
+from models.user import User, UserRole
+from utils.cpu_acceleration import check_acceleration
+
+try:
+    import orjson
+except ImportError:  # optional C JSON codec
+    orjson = None
 
-# Password Hashing Configuration
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Password Hashing Configuration (Argon2id via argon2-cffi; hashes stay PHC strings,
+# so ones written earlier through passlib still verify)
+_ph = PasswordHasher(time_cost=3, memory_cost=64 * 1024, parallelism=4)
 
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
+DEFAULT_TOKEN_EXPIRE_SECONDS = 15 * 60
 
 # Security scheme for bearer token
 security = HTTPBearer()
 
+# Verified-token cache: blake2b(token) -> (payload, exp). Entries never outlive the token itself.
+TOKEN_CACHE_TTL_SECONDS = 60
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+_DECODE_OPTIONS = {"require": ["sub", "exp"], "verify_exp": True}
+
+# HS256 fast path for tokens minted by create_access_token: the key schedule is done
+# once here and each verification copies the keyed context. Anything else goes to PyJWT.
+_HS256_HEADER_SEGMENT = b"eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9"  # {"alg":"HS256","typ":"JWT"}
+_HS256_PROTOTYPE = hmac.new(SECRET_KEY.encode(), digestmod=hashlib.sha256)
+_FAST_PATH_CLAIMS = frozenset({"sub", "exp", "role", "email"})
+_USE_PYJWT = object()
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+    _json_loads = json.loads
+
+# Auth-relevant user fields: (user_id, generation) -> (id, role value, is_active).
+# The generation lives in Redis so a bump from any worker orphans every worker's
+# entries filled from an older read. It only has to outlive the entries it guards.
+USER_CACHE_TTL_SECONDS = 30
+USER_GENERATION_TTL_SECONDS = 2 * USER_CACHE_TTL_SECONDS
+_user_cache = TTLCache(maxsize=5000, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
+
 def generate_salt(length: int = 16) -> str:
     """Generate a unique random salt string."""
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for i in range(length))
+    # One urandom draw; base64url yields ~1.33 chars per byte so `length` bytes always suffice
+    return secrets.token_urlsafe(length)[:length]
+
+def get_password_hash(password: str) -> str:
+    """
+    Hash password using Argon2id.
+    Argon2 generates and embeds its own random salt in the returned hash,
+    so users created from now on store an empty `salt` column.
+    """
+    return _ph.hash(password)
+
+def verify_password(plain_password: str, hashed_password: str, salt: str = "") -> bool:
+    """
+    Verify the password against the hash.
+    `salt` is only non-empty for hashes created when a user salt was appended to the password.
+    """
+    salted_password = plain_password + salt if salt else plain_password
+    try:
+        return _ph.verify(hashed_password, salted_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
-def get_password_hash(password: str, salt: str) -> str:
+def rehash_password_if_needed(user, plain_password: str) -> bool:
     """
-    Append salt to password and hash using Argon2id.
-    Note: passlib handles the internal salting for Argon2, 
-    but we are appending a user-specific salt as requested.
+    After a successful login, upgrade the stored hash in place when it uses a
+    legacy user salt or older Argon2 parameters. The caller commits.
+    
+    Returns:
+        True if the user's hash was replaced
     """
-    salted_password = password + salt
-    return pwd_context.hash(salted_password)
+    if not user.salt and not _ph.check_needs_rehash(user.hashed_password):
+        return False
+    
+    user.hashed_password = get_password_hash(plain_password)
+    user.salt = ""
+    return True
 
-def verify_password(plain_password: str, hashed_password: str, salt: str) -> bool:
-    """Verify the password against the hash using the salt."""
-    salted_password = plain_password + salt
-    return pwd_context.verify(salted_password, hashed_password)
+def verify_passwords_batch(items: List[Tuple[str, str, str]], max_workers: Optional[int] = None) -> List[bool]:
+    """
+    Verify many (plain_password, hashed_password, salt) triples in parallel.
+    argon2-cffi releases the GIL while hashing, so threads scale across cores.
+    Intended for bulk jobs (re-hash migrations, admin scripts), not request paths.
+    """
+    if not items:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda item: verify_password(*item), items))
 
 def validate_password_strength(password: str) -> bool:
     """
@@ -62,41 +151,209 @@ def validate_password_strength(password: str) -> bool:
         raise ValueError("Password must contain at least one special character")
     return True
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+def create_access_token(*, expires_delta: Optional[timedelta] = None, **claims):
+    """
+    Mint an access token from keyword claims (sub=..., role=..., email=...).
+    The kwargs dict is already private to this call, so exp is added in place.
+    """
+    # Numeric exp (seconds since epoch) is what the JWT carries anyway
+    lifetime = int(expires_delta.total_seconds()) if expires_delta else DEFAULT_TOKEN_EXPIRE_SECONDS
+    claims["exp"] = int(time.time()) + lifetime
+    return _encode_hs256(claims)
 
-def decode_access_token(token: str) -> Optional[dict]:
-    """Decode and verify JWT token"""
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def _b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def _b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+def _encode_hs256(claims: dict) -> str:
+    """Sign claims as an HS256 JWT, byte-compatible with jwt.encode for the same header."""
+    payload = _json_dumps(claims)
+    if not payload.isascii():
+        # orjson writes raw UTF-8; PyJWT's json.dumps escapes it as \uXXXX
+        payload = json.dumps(claims, separators=(",", ":")).encode()
+    signing_input = _HS256_HEADER_SEGMENT + b"." + _b64url_encode(payload)
+    signer = _HS256_PROTOTYPE.copy()
+    signer.update(signing_input)
+    return (signing_input + b"." + _b64url_encode(signer.digest())).decode()
+
+def _verify_jws_fast(token: str):
+    """
+    Verify an HS256 token carrying only the claims this app mints.
+    Returns the payload, None for a bad signature or expired token,
+    or _USE_PYJWT when the token needs PyJWT's full validation.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        header, payload_segment, signature = token.encode("ascii").split(b".")
+    except (UnicodeEncodeError, ValueError):
+        return _USE_PYJWT
+    
+    if header != _HS256_HEADER_SEGMENT:
+        return _USE_PYJWT
+    
+    signer = _HS256_PROTOTYPE.copy()
+    signer.update(header + b"." + payload_segment)
+    try:
+        if not compare_digest(signer.digest(), _b64url_decode(signature)):
+            return None
+        payload = _json_loads(_b64url_decode(payload_segment))
+    except ValueError:
+        return _USE_PYJWT
+    
+    if (
+        not isinstance(payload, dict)
+        or not _FAST_PATH_CLAIMS.issuperset(payload)
+        or not isinstance(payload.get("sub"), str)
+        or type(payload.get("exp")) is not int
+    ):
+        return _USE_PYJWT
+    
+    if payload["exp"] <= time.time():
         return None
+    
+    return payload
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """
+    Decode and verify JWT token.
+    Verified payloads are cached until min(TTL, exp); invalid tokens are never cached.
+    The returned dict may be shared between requests, so callers must not mutate it.
+    """
+    cache_key = _token_cache_key(token)
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+    
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+    
+    payload = _verify_jws_fast(token)
+    if payload is None:
+        return None
+    
+    if payload is _USE_PYJWT:
+        try:
+            # sub and exp are enforced during verification, so callers can index them directly
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options=_DECODE_OPTIONS)
+        except PyJWTError:
+            return None
+    
+    with _token_cache_lock:
+        _token_cache[cache_key] = (payload, payload["exp"])
+    
+    return payload
 
-import hashlib
 from fastapi import Request
 
+def invalidate_cached_token(token: Optional[str]) -> None:
+    """Drop a token from the verified-token cache (call on logout)."""
+    if not token:
+        return
+    with _token_cache_lock:
+        _token_cache.pop(_token_cache_key(token), None)
+
+def get_cached_user(db: Session, user_id: int) -> Optional[Tuple[int, str, bool]]:
+    """
+    Return (id, role value, is_active) for a user, from cache when possible.
+    If Redis is unreachable the generation is unknown, so the database is read.
+    """
+    generation_key = f"user:gen:{user_id}"
+    try:
+        generation = sync_redis_client.get(generation_key) or "0"
+    except RedisError as e:
+        logger.warning(f"User cache generation read failed: {e}")
+        generation = None
+    
+    if generation is not None:
+        cache_key = (user_id, generation)
+        with _user_cache_lock:
+            cached = _user_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    row = db.query(User.id, User.role, User.is_active).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    
+    cached = (row.id, row.role.value, row.is_active)
+    if generation is not None:
+        with _user_cache_lock:
+            _user_cache[cache_key] = cached
+    
+    return cached
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Bump a user's cache generation on every worker (call after committing a role, status or delete)."""
+    generation_key = f"user:gen:{user_id}"
+    try:
+        pipe = sync_redis_client.pipeline()
+        pipe.incr(generation_key)
+        pipe.expire(generation_key, USER_GENERATION_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        # Readers that cannot reach Redis go to the database, so only a
+        # transient failure leaves other workers stale, for at most the TTL
+        logger.error(f"User cache invalidation failed for user {user_id}: {e}")
+
 def generate_verification_code(length: int = 6) -> str:
     """Generate a numeric verification code."""
-    return ''.join(secrets.choice(string.digits) for i in range(length))
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
+
+def secure_equals(a: Optional[str], b: Optional[str]) -> bool:
+    """
+    Constant-time string comparison for secrets (codes, tokens, fingerprints).
+    Use instead of == whenever either side comes from the client.
+    """
+    if a is None or b is None:
+        return False
+    return compare_digest(a.encode(), b.encode())
+
+def verify_verification_code(stored_code: Optional[str], submitted_code: Optional[str]) -> bool:
+    """Check a submitted verification/reset code against the stored one."""
+    if not stored_code or not submitted_code:
+        return False
+    return secure_equals(stored_code, submitted_code)
+
+def _device_fingerprint_source(request: Request) -> str:
+    user_agent = request.headers.get("user-agent", "")
+    client_ip = request.client.host if request.client else "unknown"
+    
+    return f"{user_agent}|{client_ip}"
+
+# The same browser (or NAT'd office) sends the same UA|IP pair over and over
+@functools.lru_cache(maxsize=4096)
+def _fingerprint_hex(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
 
 def generate_device_fingerprint(request: Request) -> str:
     """
     Generate a unique device fingerprint based on request headers.
     Combines User-Agent and Client IP.
+    Hex form, for storing in UserDevice.fingerprint_hash and logging.
     """
-    user_agent = request.headers.get("user-agent", "")
-    client_ip = request.client.host if request.client else "unknown"
+    return _fingerprint_hex(_device_fingerprint_source(request))
+
+# SHA-256 throughput below this on a SHA-NI CPU means OpenSSL is not using
+# the SHA extensions (the scalar/AVX2 path runs at roughly a third of the speed)
+SHA_NI_MIN_MBPS = 800
+
+def check_sha_acceleration() -> bool:
+    """
+    Startup self-test for hardware SHA-256.
+    hashlib.sha256 runs inside the OpenSSL CPython links against; logs an advisory
+    when the CPU advertises SHA-NI but a 64KB benchmark runs at software speed.
+    
+    Returns:
+        False if acceleration looks missing, True otherwise
+    """
+    import ssl
     
-    raw_string = f"{user_agent}|{client_ip}"
-    return hashlib.sha256(raw_string.encode()).hexdigest()
+    return check_acceleration(
+        "sha_ni", "SHA-256", lambda data: hashlib.sha256(data).digest(), SHA_NI_MIN_MBPS, ssl.OPENSSL_VERSION
+    )
 
 
 async def get_current_user(
@@ -110,8 +367,6 @@ async def get_current_user(
     1. HttpOnly cookie (access_token) - preferred for security
     2. Authorization Bearer header - for API clients
     """
-    from models.user import User
-    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -138,84 +393,96 @@ async def get_current_user(
     if payload is None:
         raise credentials_exception
     
-    user_id_str = payload.get("sub")
-    if user_id_str is None:
-        raise credentials_exception
-    
     try:
-        user_id = int(user_id_str)
+        user_id = int(payload["sub"])
     except (ValueError, TypeError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
+    cached_user = get_cached_user(db, user_id)
+    if cached_user is None:
         raise credentials_exception
     
     # Check if user is active
-    if hasattr(user, 'is_active') and not user.is_active:
+    if not cached_user[2]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Account is disabled"
         )
     
+    # Attach a persistent User to this session from the cached fields without a SELECT;
+    # id/role/is_active are populated, any other attribute lazy-loads on first access,
+    # and routes can still mutate and commit it as usual.
+    user = User(id=cached_user[0], role=UserRole(cached_user[1]), is_active=cached_user[2])
+    make_transient_to_detached(user)
+    user = db.merge(user, load=False)
+    request.state.user_id = user_id
     return user
 
 
-def require_roles(*allowed_roles):
+def handle_deleted_current_user(request: Request, exc: ObjectDeletedError):
     """
-    Dependency factory to require specific roles.
-    
-    Usage:
-        @router.get("/admin-only", dependencies=[Depends(require_roles("admin", "superadmin"))])
+    Exception handler for a lazy load on the get_current_user shell whose row
+    was deleted (possibly by another worker) while the cache still held it.
+    Answers 401 like a token for an unknown user; any other deleted object is
+    re-raised and stays a 500.
     """
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is None:
+        raise exc
+    
+    db = SessionLocal()
+    try:
+        user_exists = db.query(User.id).filter(User.id == user_id).first() is not None
+    finally:
+        db.close()
+    
+    if user_exists:
+        raise exc
+    
+    invalidate_cached_user(user_id)
+    return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"detail": "Could not validate credentials"},
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _make_role_checker(allowed: frozenset, detail: str):
     async def role_checker(current_user: User = Depends(get_current_user)):
-        from models.user import User, UserRole
-        if current_user.role.value not in allowed_roles:
+        if current_user.role.value not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions"
+                detail=detail
             )
         return current_user
     return role_checker
 
 
-# Convenience dependencies for role checking
-async def get_current_active_user(current_user = Depends(get_current_user)):
-    """Get current user and verify they are active"""
-    if hasattr(current_user, 'is_active') and not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
-
-
-async def get_current_admin(current_user = Depends(get_current_user)):
-    """Require admin or superadmin role"""
-    from models.user import UserRole
-    if current_user.role not in [UserRole.ADMIN, UserRole.SUPERADMIN]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Admin privileges required"
-        )
-    return current_user
+def require_roles(*allowed_roles, detail: str = "Insufficient permissions"):
+    """
+    Dependency factory to require specific roles.
+    Roles may be given as UserRole members or their string values.
+    The same role set returns the same dependency, so FastAPI resolves it once per request.
+    
+    Usage:
+        @router.get("/admin-only", dependencies=[Depends(require_roles("admin", "superadmin"))])
+    """
+    allowed = frozenset(role.value if isinstance(role, UserRole) else role for role in allowed_roles)
+    return _make_role_checker(allowed, detail)
 
 
-async def get_current_doctor(current_user = Depends(get_current_user)):
-    """Require doctor role"""
-    from models.user import UserRole
-    if current_user.role != UserRole.DOCTOR:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Doctor privileges required"
-        )
-    return current_user
+# get_current_user already rejects disabled accounts; kept as an alias so existing
+# imports resolve to the same dependency node
+get_current_active_user = get_current_user
 
 
-async def get_current_staff_or_above(current_user = Depends(get_current_user)):
-    """Require staff, admin, or superadmin role"""
-    from models.user import UserRole
-    allowed = [UserRole.STAFF, UserRole.ADMIN, UserRole.SUPERADMIN]
-    if current_user.role not in allowed:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Staff privileges required"
-        )
-    return current_user
+# Role dependencies; each is a single module-level callable, so FastAPI resolves
+# get_current_user once per request however many of them a route combines
+get_current_admin = require_roles(
+    UserRole.ADMIN, UserRole.SUPERADMIN, detail="Admin privileges required"
+)
+get_current_doctor = require_roles(UserRole.DOCTOR, detail="Doctor privileges required")
+get_current_staff_or_above = require_roles(
+    UserRole.STAFF, UserRole.ADMIN, UserRole.SUPERADMIN, detail="Staff privileges required"
+)
@@ -3,17 +3,37 @@ Dummy SMS notification service for development/demo purposes.
 Replace with real SMS gateway (Twilio, AWS SNS, etc.) in production.
 """
 import logging
+import os
+from collections import defaultdict, deque
 from datetime import datetime
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Debug history bounds, so a long-running dev process keeps flat memory
+SMS_HISTORY_LIMIT = 10_000
+SMS_HISTORY_PER_PHONE_LIMIT = 100
+
 
 class DummySMSService:
     """Simulates SMS sending without actual SMS delivery"""
     
     def __init__(self):
-        self.sent_messages = []  # Store for testing/debugging
+        self.sent_messages = deque(maxlen=SMS_HISTORY_LIMIT)  # Store for testing/debugging
+        self._by_phone = defaultdict(lambda: deque(maxlen=SMS_HISTORY_PER_PHONE_LIMIT))
+    
+    def _record(self, sms_record: dict):
+        """Append to the history and the per-phone index, evicting the oldest record together"""
+        if len(self.sent_messages) == self.sent_messages.maxlen:
+            oldest = self.sent_messages[0]
+            phone_history = self._by_phone.get(oldest["phone_number"])
+            if phone_history and phone_history[0] is oldest:
+                phone_history.popleft()
+                if not phone_history:
+                    del self._by_phone[oldest["phone_number"]]
+        
+        self.sent_messages.append(sms_record)
+        self._by_phone[sms_record["phone_number"]].append(sms_record)
     
     def send_sms(self, phone_number: str, message: str) -> dict:
         """
@@ -35,10 +55,6 @@ class DummySMSService:
                 "timestamp": datetime.utcnow().isoformat()
             }
         
-        # Simulate SMS sending
-        logger.info(f"[DUMMY SMS] Sending to {phone_number}")
-        logger.info(f"[DUMMY SMS] Message: {message}")
-        
         # Store message for debugging
         sms_record = {
             "phone_number": phone_number,
@@ -46,16 +62,14 @@ class DummySMSService:
             "timestamp": datetime.utcnow().isoformat(),
             "status": "sent"
         }
-        self.sent_messages.append(sms_record)
+        self._record(sms_record)
         
-        # Print to console for visibility during development
-        print("\n" + "="*60)
-        print("📱 DUMMY SMS NOTIFICATION")
-        print("="*60)
-        print(f"To: {phone_number}")
-        print(f"Message: {message}")
-        print(f"Time: {sms_record['timestamp']}")
-        print("="*60 + "\n")
+        # Visible during development with DEBUG logging; formatting is skipped otherwise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[DUMMY SMS] to=%s msg=%s ts=%s",
+                phone_number, message, sms_record["timestamp"]
+            )
         
         return {
             "success": True,
@@ -108,16 +122,55 @@ class DummySMSService:
     def get_sent_messages(self, phone_number: Optional[str] = None) -> list:
         """Get sent messages (for testing/debugging)"""
         if phone_number:
-            return [msg for msg in self.sent_messages if msg["phone_number"] == phone_number]
-        return self.sent_messages
+            return list(self._by_phone.get(phone_number, ()))
+        return list(self.sent_messages)
     
     def clear_history(self):
         """Clear message history (for testing)"""
-        self.sent_messages = []
+        self.sent_messages.clear()
+        self._by_phone.clear()
+
+
+_OK_RESULT = {
+    "success": True,
+    "message": "SMS discarded (null backend)",
+}
+
+
+class _NullSMSService:
+    """
+    Drop-in no-op backend (SMS_BACKEND=null) for deployments without an SMS gateway,
+    so bulk reminder jobs skip validation, message formatting and history entirely.
+    Every send returns a fresh copy of the same result, like the dummy backend's dicts.
+    """
+    
+    def send_sms(self, phone_number: str, message: str) -> dict:
+        return _OK_RESULT.copy()
+    
+    def send_verification_code(self, phone_number: str, code: str) -> dict:
+        return _OK_RESULT.copy()
+    
+    def send_appointment_reminder(self, phone_number: str, doctor_name: str, appointment_time: str) -> dict:
+        return _OK_RESULT.copy()
+    
+    def send_medication_reminder(self, phone_number: str, medication_name: str, dosage: str) -> dict:
+        return _OK_RESULT.copy()
+    
+    def send_prescription_ready(self, phone_number: str, pharmacy_name: str) -> dict:
+        return _OK_RESULT.copy()
+    
+    def get_sent_messages(self, phone_number: Optional[str] = None) -> list:
+        return []
+    
+    def clear_history(self):
+        pass
 
 
 # Global instance
-sms_service = DummySMSService()
+if os.getenv("SMS_BACKEND", "dummy").lower() == "null":
+    sms_service = _NullSMSService()
+else:
+    sms_service = DummySMSService()
 
 
 def send_sms(phone_number: str, message: str) -> dict: